@@ -56,6 +56,13 @@ Options:
                         Replaces QUERY. Cannot be combined with QUERY, lines START-END / ~START-END,
                         --regex, or --list.
 
+  --queries-file FILE   Run every QUERY listed in FILE (one per line) against the same files,
+                        parsing each file only once. Each query's output is followed by a
+                        \x1e (record separator) line. Replaces QUERY; cannot be combined with
+                        --at, --regex, --list, or line ranges. The rg prefilter is not used
+                        in this mode (every candidate file is parsed). Exits 0 only if every
+                        query matched, 1 if any query matched nothing.
+
   -h, --help            Show this help message
 
 Examples:
@@ -96,6 +103,7 @@ AT_PATTERN=""
 IMPORT_MODE="none"
 TYPE_FILTER="py"
 CONTEXT_LINES=0
+QUERIES_FILE=""
 POSITIONAL_ARGS=()
 
 while [ $# -gt 0 ]; do
@@ -111,6 +119,10 @@ while [ $# -gt 0 ]; do
             shift
             if [ $# -eq 0 ]; then echo "Error: --at requires a PATTERN" >&2; exit 2; fi
             AT_PATTERN="$1"; shift ;;
+        --queries-file)
+            shift
+            if [ $# -eq 0 ]; then echo "Error: --queries-file requires a FILE" >&2; exit 2; fi
+            QUERIES_FILE="$1"; shift ;;
         --import|--imports) IMPORT_MODE="all"; shift ;;
         --import=all|--imports=all) IMPORT_MODE="all"; shift ;;
         --import=used|--imports=used) IMPORT_MODE="used"; shift ;;
@@ -196,7 +208,7 @@ for ((i=0; i<${#POSITIONAL_ARGS[@]}; i++)); do
     # Check for smart line range (if not already found and no query set)
     # Only treat bare range as line mode if we don't have a query yet (and not regex/list mode)
     HAS_QUERY_OR_MODE="false"
-    if [ -n "$REGEX_PATTERN" ] || [ -n "$AT_PATTERN" ] || [ "$LIST_MODE" = "true" ] || [ -n "$QUERY" ] || [ "$LINE_MODE" = "true" ]; then
+    if [ -n "$REGEX_PATTERN" ] || [ -n "$AT_PATTERN" ] || [ -n "$QUERIES_FILE" ] || [ "$LIST_MODE" = "true" ] || [ -n "$QUERY" ] || [ "$LINE_MODE" = "true" ]; then
         HAS_QUERY_OR_MODE="true"
     fi
 
@@ -232,12 +244,12 @@ for ((i=0; i<${#POSITIONAL_ARGS[@]}; i++)); do
 done
 
 # Auto-enable list mode if roots provided but no query/mode
-if [ ${#SEARCH_ROOTS[@]} -gt 0 ] && [ -z "$QUERY" ] && [ -z "$REGEX_PATTERN" ] && [ -z "$AT_PATTERN" ] && [ "$LINE_MODE" != "true" ]; then
+if [ ${#SEARCH_ROOTS[@]} -gt 0 ] && [ -z "$QUERY" ] && [ -z "$REGEX_PATTERN" ] && [ -z "$AT_PATTERN" ] && [ -z "$QUERIES_FILE" ] && [ "$LINE_MODE" != "true" ]; then
     LIST_MODE="true"
 fi
 
 # Validation
-if [ "$LIST_MODE" != "true" ] && [ -z "$REGEX_PATTERN" ] && [ -z "$AT_PATTERN" ] && [ -z "$QUERY" ] && [ "$LINE_MODE" != "true" ]; then
+if [ "$LIST_MODE" != "true" ] && [ -z "$REGEX_PATTERN" ] && [ -z "$AT_PATTERN" ] && [ -z "$QUERIES_FILE" ] && [ -z "$QUERY" ] && [ "$LINE_MODE" != "true" ]; then
     echo "Error: Missing FUNCTION_NAME (or use --at / --regex / --list / lines START-END)" >&2
     exit 2
 fi
@@ -262,6 +274,17 @@ if [ -n "$AT_PATTERN" ]; then
     fi
 fi
 
+if [ -n "$QUERIES_FILE" ]; then
+    if [ ! -f "$QUERIES_FILE" ]; then
+        echo "Error: queries file not found: $QUERIES_FILE" >&2
+        exit 2
+    fi
+    if [ -n "$AT_PATTERN" ] || [ -n "$REGEX_PATTERN" ] || [ "$LIST_MODE" = "true" ] || [ "$LINE_MODE" = "true" ]; then
+        echo "Error: --queries-file cannot be combined with --at, --regex, --list, or line ranges" >&2
+        exit 2
+    fi
+fi
+
 if [ ${#SEARCH_ROOTS[@]} -eq 0 ]; then
     echo "Error: Missing FILES/ROOTS" >&2
     echo "Run with --help for usage information." >&2
@@ -280,6 +303,7 @@ export PF_LINE_MODE="$LINE_MODE"
 export PF_LINE_SPEC="$LINE_SPEC"
 export PF_TYPE_FILTER="$TYPE_FILTER"
 export PF_CONTEXT_LINES="$CONTEXT_LINES"
+export PF_QUERIES_FILE="$QUERIES_FILE"
 
 # --- RG Optimization ---
 PF_MATCHES_FILE=""
@@ -440,6 +464,7 @@ line_mode = os.environ["PF_LINE_MODE"] == "true"
 line_spec = os.environ["PF_LINE_SPEC"]
 type_filter = os.environ["PF_TYPE_FILTER"]
 matches_file = os.environ.get("PF_MATCHES_FILE")
+queries_file = os.environ.get("PF_QUERIES_FILE") or None
 try:
     context_lines = int(os.environ["PF_CONTEXT_LINES"])
 except ValueError:
@@ -772,12 +797,46 @@ if at_pattern_str:
         print(f"  {e}", file=sys.stderr)
         sys.exit(2)
 
+# Source and AST caches, so --queries-file reads and parses each file only once.
+# Only enabled in batch mode; a single query reads and parses each file once
+# anyway and should not keep every scanned file in memory until exit.
+# Failures are cached as their message and reported only once.
+_source_cache = {} if queries_file else None
+_tree_cache = {} if queries_file else None
+_reported_errors = set()
+
+def _cached(cache, path, load):
+    if cache is None:
+        return load()
+    if path not in cache:
+        try:
+            cache[path] = (True, load())
+        except Exception as e:
+            cache[path] = (False, str(e))
+    ok, value = cache[path]
+    if not ok:
+        raise RuntimeError(value)
+    return value
+
+def read_source(path):
+    def load():
+        with tokenize.open(path) as f:
+            return f.read()
+    return _cached(_source_cache, path, load)
+
+def parse_source(path, source):
+    return _cached(_tree_cache, path, lambda: ast.parse(source, filename=path))
+
+def report_error_once(msg):
+    if msg not in _reported_errors:
+        _reported_errors.add(msg)
+        print(msg, file=sys.stderr)
+
 def process_file(path, targets=None):
     try:
-        with tokenize.open(path) as f:
-            source = f.read()
+        source = read_source(path)
     except Exception as e:
-        print(f"Error reading {path}: {e}", file=sys.stderr)
+        report_error_once(f"Error reading {path}: {e}")
         return [], True
 
     # Fast Path Optimization (1)
@@ -847,9 +906,9 @@ def process_file(path, targets=None):
         return [], False
 
     try:
-        tree = ast.parse(source, filename=path)
+        tree = parse_source(path, source)
     except Exception as e:
-        print(f"Error parsing {path}: {e}", file=sys.stderr)
+        report_error_once(f"Error parsing {path}: {e}")
         return [], True
 
     if current_line_mode:
@@ -1008,22 +1067,23 @@ else:
     file_list = file_list_canonical
     missing_list = missing_list_baseline
 
-any_match = False
-had_error = False
-
 for m in missing_list:
     if m.startswith("glob matched no files:"):
         print(f"Warning: {m}", file=sys.stderr)
     else:
         print(f"Warning: file not found: {m}", file=sys.stderr)
 
-for path in file_list:
-    tgs = file_targets.get(path) if file_targets else None
-    matches, error = process_file(path, targets=tgs)
-    if error:
-        had_error = True
+def run_files(file_list):
+    any_match = False
+    had_error = False
+    for path in file_list:
+        tgs = file_targets.get(path) if file_targets else None
+        matches, error = process_file(path, targets=tgs)
+        if error:
+            had_error = True
 
-    if matches:
+        if not matches:
+            continue
         any_match = True
 
         if list_mode:
@@ -1038,6 +1098,30 @@ for path in file_list:
                 print(header)
                 print(code)
                 print()
+    return any_match, had_error
+
+if queries_file:
+    try:
+        with open(queries_file) as f:
+            queries = [q.strip() for q in f if q.strip()]
+    except OSError as e:
+        print(f"Error reading queries file: {e}", file=sys.stderr)
+        sys.exit(2)
+    if not queries:
+        print(f"Error: queries file contains no queries: {queries_file}", file=sys.stderr)
+        sys.exit(2)
+
+    # Exit status covers the whole batch: 0 only if every query matched.
+    all_matched = True
+    had_error = False
+    for target in queries:
+        matched, error = run_files(file_list)
+        all_matched = all_matched and matched
+        had_error = had_error or error
+        print("\x1e")
+    sys.exit(2 if had_error else (0 if all_matched else 1))
+
+any_match, had_error = run_files(file_list)
 
 if not any_match:
     if target and type_filter == 'py' and not list_mode and sys.stderr.isatty():
@@ -2,13 +2,55 @@ import pytest
 import os
 import shutil
 import sys
+from pathlib import Path
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def script_path():
     path = os.path.abspath("printfunction.sh")
     assert os.path.exists(path), "printfunction.sh not found"
     return path
 
-@pytest.fixture
-def fixtures_dir():
-    return os.path.abspath("tests/fixtures")
+@pytest.fixture(scope="session", autouse=True)
+def _ensure_executable():
+    # Once per session (or xdist worker) rather than on every run. Not built on
+    # script_path, which test_gitdiffshow_patch.py overrides per test.
+    os.chmod(os.path.abspath("printfunction.sh"), 0o755)
+
+
+@pytest.fixture(scope="module")
+def fixtures_dir(tmp_path_factory):
+    # Per-module copy of tests/fixtures, so recursive scans over "." only ever
+    # see the checked-in fixtures plus whatever this module writes into its copy.
+    dest = tmp_path_factory.mktemp("fixtures") / "fixtures"
+    shutil.copytree(os.path.abspath("tests/fixtures"), dest, symlinks=True)
+    return str(dest)
+
+@pytest.fixture(scope="module")
+def many_matches_file(fixtures_dir):
+    # The checked-in tests/fixtures/many_matches.py, inside this module's copy.
+    return Path(fixtures_dir) / "many_matches.py"
+
+RG_SHIM = """#!/bin/sh
+case "${PF_SHIM_MODE:-}" in
+    fail2) echo "${PF_SHIM_STDERR:-Simulated RG Error}" >&2; exit 2 ;;
+    error_call) echo 'RG WAS CALLED' >&2; exit 2 ;;
+    empty0) exit 0 ;;
+    *) echo "rg shim: unknown PF_SHIM_MODE '${PF_SHIM_MODE:-}'" >&2; exit 2 ;;
+esac
+"""
+
+@pytest.fixture(scope="session")
+def rg_shim(tmp_path_factory):
+    """Env overrides that put a fake `rg` first on PATH.
+
+    The shim's behavior is picked per run via PF_SHIM_MODE:
+      fail2       print $PF_SHIM_STDERR (default "Simulated RG Error") and exit 2
+      error_call  print "RG WAS CALLED" and exit 2
+      empty0      print nothing and exit 0
+    """
+    bin_dir = tmp_path_factory.mktemp("shims")
+    shim = bin_dir / "rg"
+    shim.write_text(RG_SHIM)
+    shim.chmod(0o755)
+    return {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"}
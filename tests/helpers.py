@@ -0,0 +1,105 @@
+"""Helpers shared by the printfunction.sh test modules."""
+import functools
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LazyResult:
+    """CompletedProcess look-alike that keeps raw bytes and decodes on first access.
+
+    Tests that only check returncode never pay for decoding the output.
+    """
+
+    def __init__(self, args, returncode, stdout_bytes, stderr_bytes):
+        self.args = args
+        self.returncode = returncode
+        self.stdout_bytes = stdout_bytes
+        self.stderr_bytes = stderr_bytes
+
+    @functools.cached_property
+    def stdout(self):
+        return self.stdout_bytes.decode()
+
+    @functools.cached_property
+    def stderr(self):
+        return self.stderr_bytes.decode()
+
+    def __repr__(self):
+        return (f"LazyResult(args={self.args!r}, returncode={self.returncode!r}, "
+                f"stdout={self.stdout_bytes!r}, stderr={self.stderr_bytes!r})")
+
+
+def run_captured(script_path, args, cwd=None, env=None):
+    """Run the script with stdin closed and return its output as a LazyResult."""
+    res = subprocess.run(
+        [script_path] + args,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+    )
+    return LazyResult(res.args, res.returncode, res.stdout, res.stderr)
+
+def run_pair(script_path, args_rg, args_norg, cwd, env=None, runner=run_captured):
+    """Run args_rg normally and args_norg with PF_DISABLE_RG=1, concurrently.
+
+    `runner(script_path, args, cwd=..., env=...)` does each run; the rg run gets
+    `env` as is, and only the no-rg run gets a copy. Returns
+    (result_rg, result_no_rg).
+    """
+    env_no_rg = {**(os.environ if env is None else env), "PF_DISABLE_RG": "1"}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fut_rg = pool.submit(runner, script_path, args_rg, cwd=cwd, env=env)
+        fut_no_rg = pool.submit(runner, script_path, args_norg, cwd=cwd, env=env_no_rg)
+        return fut_rg.result(), fut_no_rg.result()
+
+@functools.lru_cache(maxsize=None)
+def _needle_scanner(needles):
+    """Build a one-pass scanner for `needles`; returns text -> set of found needles."""
+    # A zero-width lookahead alternation yields every position where some
+    # needle starts, then only those positions are checked for each needle
+    # (so needles that overlap or prefix each other are all seen).
+    starts = re.compile("(?=" + "|".join(re.escape(n) for n in needles) + ")")
+
+    def scan(text):
+        found = set()
+        for m in starts.finditer(text):
+            pos = m.start()
+            found.update(n for n in needles if n not in found and text.startswith(n, pos))
+            if len(found) == len(needles):
+                break
+        return found
+
+    return scan
+
+def assert_contains_all(text, needles):
+    """Assert every needle occurs in text, scanning text once."""
+    needles = tuple(needles)
+    found = _needle_scanner(needles)(text) if needles else set()
+    missing = [n for n in needles if n not in found]
+    assert not missing, f"missing {missing!r} in:\n{text}"
+
+def assert_contains_none(text, needles):
+    """Assert no needle occurs in text, scanning text once."""
+    needles = tuple(needles)
+    found = _needle_scanner(needles)(text) if needles else set()
+    present = [n for n in needles if n in found]
+    assert not present, f"unexpected {present!r} in:\n{text}"
+
+def write_if_changed(path, content):
+    """Write `content` to `path` unless the file already holds exactly that content."""
+    data = content.encode()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        pass
+    else:
+        if st.st_size == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
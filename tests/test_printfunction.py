@@ -1,57 +1,129 @@
 import pytest
 import subprocess
+import functools
 import os
+import re
 import sys
-import shutil
+import tempfile
 
-def run_script(script_path, args, cwd=None, env=None):
+from helpers import assert_contains_all, assert_contains_none, run_captured, run_pair
+
+# Environment for every run, copied only when a test adds overrides
+BASE_ENV = dict(os.environ)
+
+def run_script(script_path, args, cwd=None, env=None, env_overrides=None):
     """Run the printfunction.sh script and return stdout, stderr, returncode."""
     if env is None:
-        env = os.environ.copy()
-    
-    # Ensure the script is executable
-    os.chmod(script_path, 0o755)
-    
+        env = BASE_ENV
+    if env_overrides:
+        env = {**env, **env_overrides}
+    return run_captured(script_path, args, cwd=cwd, env=env)
+
+HEADER_RE = re.compile(rb"==> .* <==$")
+
+def run_script_streaming(script_path, args, predicate=HEADER_RE.match, cwd=None, env=None):
+    """Run the script keeping only stdout lines for which predicate(line) is true.
+
+    predicate sees each raw line as bytes (newline included). Returns
+    (filtered_lines, stderr, returncode) with the kept lines decoded; other
+    stdout lines are dropped as they are read, without being buffered or decoded.
+    """
+    if env is None:
+        env = BASE_ENV
+
     cmd = [script_path] + args
-    result = subprocess.run(
-        cmd,
-        cwd=cwd,
-        env=env,
-        capture_output=True,
-        text=True
-    )
-    return result
+    # stderr goes to a temp file so a chatty stderr can't block the stdout reader
+    with tempfile.TemporaryFile() as err:
+        with subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE, stderr=err) as p:
+            kept = [l.rstrip(b"\n").decode() for l in iter(p.stdout.readline, b"") if predicate(l)]
+        err.seek(0)
+        stderr = err.read().decode()
+    return kept, stderr, p.returncode
 
 def test_help(script_path):
     res = run_script(script_path, ["--help"])
     assert res.returncode == 0
     assert "Usage:" in res.stdout
 
-def test_simple_match(script_path, fixtures_dir):
+# (file, query, expected substrings, forbidden substrings) for plain name queries.
+# Cases sharing a file run as one --queries-file invocation; test_simple_match
+# covers the default, rg-prefiltered single-query path.
+BATCH_CASES = [
+    ("simple.py", "hello", ["def hello():", "==> simple.py:hello (line 1) <=="], []),
+    ("simple.py", "async_func", ["async def async_func():"], []),
+    # Match specific method in class
+    ("class_test.py", "MyClass.method", ["def method(self):", "==> class_test.py:MyClass.method"], ["class MyClass:"]),
+    # Match top level method
+    ("class_test.py", "method", ["def method(self):", "def method():"], []),
+]
+
+@pytest.fixture(scope="module")
+def batch_results(tmp_path_factory):
+    """Return a lookup that runs each file's BATCH_CASES queries once and memoizes them.
+
+    The lookup maps query -> (matched, stdout) for that query alone.
+    """
+    cache = {}
+
+    def lookup(script_path, fixtures_dir, filename):
+        key = (script_path, fixtures_dir, filename)
+        if key in cache:
+            return cache[key]
+
+        queries = [q for f, q, _, _ in BATCH_CASES if f == filename]
+        queries_file = tmp_path_factory.mktemp("queries") / "queries.txt"
+        queries_file.write_text("".join(f"{q}\n" for q in queries))
+
+        res = run_script(script_path, ["--queries-file", str(queries_file), filename], cwd=fixtures_dir)
+        assert res.returncode in (0, 1), res.stderr
+        sections = res.stdout.split("\x1e\n")[:-1]
+        assert len(sections) == len(queries), res.stdout
+        # A query matched iff its section has output
+        cache[key] = {q: (bool(out), out) for q, out in zip(queries, sections)}
+        return cache[key]
+
+    return lookup
+
+@pytest.mark.parametrize("filename,query,expected,forbidden", BATCH_CASES)
+def test_name_query_match(script_path, fixtures_dir, batch_results, filename, query, expected, forbidden):
+    matched, stdout = batch_results(script_path, fixtures_dir, filename)[query]
+    assert matched
+    assert_contains_all(stdout, expected)
+    for needle in forbidden:
+        assert needle not in stdout
+
+def test_simple_match(script_path, fixtures_dir, batch_results):
+    # Single query on the default path (rg prefilter when available); batch
+    # mode must print the same output for it.
     res = run_script(script_path, ["hello", "simple.py"], cwd=fixtures_dir)
     assert res.returncode == 0
     assert "def hello():" in res.stdout
     assert "==> simple.py:hello (line 1) <==" in res.stdout
+    assert batch_results(script_path, fixtures_dir, "simple.py")["hello"] == (True, res.stdout)
 
-def test_async_match(script_path, fixtures_dir):
-    res = run_script(script_path, ["async_func", "simple.py"], cwd=fixtures_dir)
-    assert res.returncode == 0
-    assert "async def async_func():" in res.stdout
+def test_queries_file_partial_match(script_path, fixtures_dir, tmp_path):
+    queries_file = tmp_path / "queries.txt"
+    queries_file.write_text("hello\nnonexistent\n")
+    res = run_script(script_path, ["--queries-file", str(queries_file), "simple.py"], cwd=fixtures_dir)
+    assert res.returncode == 1
+    sections = res.stdout.split("\x1e\n")
+    assert "def hello():" in sections[0]
+    assert sections[1:] == ["", ""]
 
-def test_class_method_match(script_path, fixtures_dir):
-    # Match specific method in class
-    res = run_script(script_path, ["MyClass.method", "class_test.py"], cwd=fixtures_dir)
-    assert res.returncode == 0
-    assert "class MyClass:" not in res.stdout 
-    assert "def method(self):" in res.stdout
-    assert "==> class_test.py:MyClass.method" in res.stdout
+def test_queries_file_parse_error_reported_once(script_path, fixtures_dir, tmp_path):
+    queries_file = tmp_path / "queries.txt"
+    queries_file.write_text("broken\nbroken\nbroken\n")
+    res = run_script(script_path, ["--queries-file", str(queries_file), "bad/syntax_error.py"], cwd=fixtures_dir)
+    assert res.returncode == 2
+    assert res.stderr.count("Error parsing") == 1
 
-def test_toplevel_vs_method(script_path, fixtures_dir):
-    # Match top level method
-    res = run_script(script_path, ["method", "class_test.py"], cwd=fixtures_dir)
-    assert res.returncode == 0
-    assert "def method(self):" in res.stdout
-    assert "def method():" in res.stdout
+def test_queries_file_empty(script_path, fixtures_dir, tmp_path):
+    queries_file = tmp_path / "queries.txt"
+    queries_file.write_text("\n  \n")
+    res = run_script(script_path, ["--queries-file", str(queries_file), "simple.py"], cwd=fixtures_dir)
+    assert res.returncode == 2
+    assert "queries file contains no queries" in res.stderr
 
 def test_no_match_exit_code(script_path, fixtures_dir):
     res = run_script(script_path, ["nonexistent", "simple.py"], cwd=fixtures_dir)
@@ -99,10 +171,7 @@ def test_fast_path_skips_syntax_error(script_path, fixtures_dir):
 def test_rg_globs(script_path, fixtures_dir):
     # Test that globs work with RG optimization
     # If we pass "**/*.py", RG should run.
-    os.makedirs(os.path.join(fixtures_dir, "subdir/deep"), exist_ok=True)
-    with open(os.path.join(fixtures_dir, "subdir/deep/test.py"), "w") as f:
-        f.write("def deep_func(): pass\n")
-        
+    # subdir/deep/test.py is checked in under tests/fixtures
     res = run_script(script_path, ["deep_func", "**/*.py"], cwd=fixtures_dir)
     assert res.returncode == 0
     assert "def deep_func():" in res.stdout
@@ -110,19 +179,11 @@ def test_rg_globs(script_path, fixtures_dir):
 def test_recursive_ignores(script_path, fixtures_dir):
     # Test that ignored dirs are recursively ignored
     # node_modules/pkg/ignored.py should be ignored
-    os.makedirs(os.path.join(fixtures_dir, "node_modules/pkg"), exist_ok=True)
-    with open(os.path.join(fixtures_dir, "node_modules/pkg/ignored.py"), "w") as f:
-        f.write("def should_be_ignored(): pass\n")
-        
     res = run_script(script_path, ["should_be_ignored", "."], cwd=fixtures_dir)
     assert res.returncode == 1
 
 def test_pyw_coverage(script_path, fixtures_dir):
-    # Test .pyw files are found
-    os.makedirs(os.path.join(fixtures_dir, "hidden"), exist_ok=True)
-    with open(os.path.join(fixtures_dir, "hidden/test.pyw"), "w") as f:
-        f.write("def hidden_func(): pass\n")
-        
+    # Test .pyw files are found (hidden/test.pyw is checked in under tests/fixtures)
     res = run_script(script_path, ["hidden_func", "."], cwd=fixtures_dir)
     assert res.returncode == 0
     assert "def hidden_func():" in res.stdout
@@ -131,24 +192,24 @@ def test_rg_vs_no_rg(script_path, fixtures_dir):
     # We want to run the exact same command with RG enabled (default if installed) and disabled.
     # We disable RG by hiding it from PATH.
     
-    # Run with rg (normal environment)
-    res_rg = run_script(script_path, ["hello", "."], cwd=fixtures_dir)
-    
-    # Run without rg
-    # Use the internal env var PF_DISABLE_RG=1
-    env_no_rg = os.environ.copy()
-    env_no_rg["PF_DISABLE_RG"] = "1"
-    
-    res_no_rg = run_script(script_path, ["hello", "."], cwd=fixtures_dir, env=env_no_rg)
+    # Only headers (and the def line checked below) are kept from stdout
+    keep = lambda l: HEADER_RE.match(l) or l == b"def hello():\n"
+
+    # Run with rg (normal environment) and without rg (internal env var
+    # PF_DISABLE_RG=1) side by side
+    (lines_rg, _, rc_rg), (lines_no_rg, _, rc_no_rg) = run_pair(
+        script_path, ["hello", "."], ["hello", "."], fixtures_dir, env=BASE_ENV,
+        runner=functools.partial(run_script_streaming, predicate=keep),
+    )
     
-    assert res_rg.returncode == res_no_rg.returncode
+    assert rc_rg == rc_no_rg
     
     # Extract headers
-    headers_rg = sorted([l for l in res_rg.stdout.splitlines() if l.startswith("==>")])
-    headers_no_rg = sorted([l for l in res_no_rg.stdout.splitlines() if l.startswith("==>")])
+    headers_rg = sorted(l for l in lines_rg if HEADER_RE.match(l.encode()))
+    headers_no_rg = sorted(l for l in lines_no_rg if HEADER_RE.match(l.encode()))
     
     assert headers_rg == headers_no_rg
-    assert "def hello():" in res_rg.stdout
+    assert "def hello():" in lines_rg
 
 def test_type_filter_all(script_path, fixtures_dir):
     # default type=py
@@ -163,8 +224,7 @@ def test_type_filter_all(script_path, fixtures_dir):
 def test_list_mode(script_path, fixtures_dir):
     res = run_script(script_path, ["--list", "simple.py"], cwd=fixtures_dir)
     assert res.returncode == 0
-    assert "hello" in res.stdout
-    assert "world" in res.stdout
+    assert_contains_all(res.stdout, ["hello", "world"])
 
 def test_regex_mode(script_path, fixtures_dir):
     res = run_script(script_path, ["--regex", "h.*", "simple.py"], cwd=fixtures_dir)
@@ -193,8 +253,7 @@ def test_colon_in_filename(script_path, fixtures_dir):
     
     res = run_script(script_path, ["weird_func", target_file], cwd=fixtures_dir)
     assert res.returncode == 0
-    assert "def weird_func():" in res.stdout
-    assert "weird:dir/file.py" in res.stdout
+    assert_contains_all(res.stdout, ["def weird_func():", "weird:dir/file.py"])
 
 def test_missing_root_warnings(script_path, fixtures_dir):
     # Ensure warnings are printed for missing roots
@@ -202,47 +261,24 @@ def test_missing_root_warnings(script_path, fixtures_dir):
     assert res.returncode == 1
     assert "Warning: file not found: nonexistent_file.py" in res.stderr
 
-def test_many_matches_performance(script_path, fixtures_dir):
+def test_many_matches_performance(script_path, fixtures_dir, many_matches_file):
     # Performance correctness check
-    # Create file if not exists
-    many_file = os.path.join(fixtures_dir, "many_matches.py")
-    if not os.path.exists(many_file):
-        with open(many_file, "w") as f:
-            f.write("def many_matches_func(): pass\n")
-            for i in range(1000):
-                f.write(f"def func_{i}(): pass\n")
-
-    res = run_script(script_path, ["many_matches_func", "many_matches.py"], cwd=fixtures_dir)
+    res = run_script(script_path, ["many_matches_func", many_matches_file.name], cwd=fixtures_dir)
     assert res.returncode == 0
     assert "def many_matches_func():" in res.stdout
     # Should not print the 1000 other funcs
-    assert "def func_1():" not in res.stdout
+    assert_contains_none(res.stdout, ["def func_0():", "def func_1():", "def func_999():"])
 
-def test_rg_fallback_on_failure(script_path, fixtures_dir):
+def test_rg_fallback_on_failure(script_path, fixtures_dir, rg_shim):
     # Mock rg failure by using a wrapper script that exits 2
-    import tempfile
-    
-    tmp_bin = tempfile.mkdtemp()
-    rg_shim = os.path.join(tmp_bin, "rg")
-    with open(rg_shim, "w") as f:
-        f.write("#!/bin/sh\n")
-        f.write("echo 'Simulated RG Error' >&2\n")
-        f.write("exit 2\n")
-    os.chmod(rg_shim, 0o755)
-    
-    env = os.environ.copy()
-    env["PATH"] = f"{tmp_bin}{os.pathsep}{env.get('PATH', '')}"
-    
-    try:
-        res = run_script(script_path, ["hello", "simple.py"], cwd=fixtures_dir, env=env)
-        # Should fall back to python and succeed
-        assert res.returncode == 0
-        assert "def hello():" in res.stdout
-        # Should see warning
-        assert "Warning: rg failed (exit 2)" in res.stderr
-        assert "Simulated RG Error" in res.stderr
-    finally:
-        shutil.rmtree(tmp_bin)
+    shim_env = {**rg_shim, "PF_SHIM_MODE": "fail2"}
+
+    res = run_script(script_path, ["hello", "simple.py"], cwd=fixtures_dir, env_overrides=shim_env)
+    # Should fall back to python and succeed
+    assert res.returncode == 0
+    assert "def hello():" in res.stdout
+    # Should see warning
+    assert_contains_all(res.stderr, ["Warning: rg failed (exit 2)", "Simulated RG Error"])
 
 def test_no_duplicate_missing_root_warnings(script_path, fixtures_dir):
     # Test that missing root warning appears exactly once
@@ -258,53 +294,28 @@ def test_glob_no_files_warning_with_rg(script_path, fixtures_dir):
     assert res.returncode == 0
     assert "Warning: glob matched no files: *.missing_extension" in res.stderr
 
-def test_rg_disabled_for_type_all(script_path, fixtures_dir):
+def test_rg_disabled_for_type_all(script_path, fixtures_dir, rg_shim):
     # Ensure rg is NOT called when --type all is used
-    import tempfile
-    
-    tmp_bin = tempfile.mkdtemp()
-    rg_shim = os.path.join(tmp_bin, "rg")
-    with open(rg_shim, "w") as f:
-        f.write("#!/bin/sh\n")
-        f.write("echo 'RG WAS CALLED' >&2\n")
-        f.write("exit 2\n") # Fail if called
-    os.chmod(rg_shim, 0o755)
-    
-    env = os.environ.copy()
-    env["PATH"] = f"{tmp_bin}{os.pathsep}{env.get('PATH', '')}"
-    
-    try:
-        # Case 1: type all -> rg should NOT be called
-        res_all = run_script(script_path, ["--type", "all", "hello", "simple.py"], cwd=fixtures_dir, env=env)
-        assert res_all.returncode == 0
-        assert "RG WAS CALLED" not in res_all.stderr
-        
-        # Case 2: type py -> rg SHOULD be called (and fail with warning, but fallback succeeds)
-        res_py = run_script(script_path, ["hello", "simple.py"], cwd=fixtures_dir, env=env)
-        assert res_py.returncode == 0
-        assert "RG WAS CALLED" in res_py.stderr
-        assert "Warning: rg failed" in res_py.stderr
-        
-    finally:
-        shutil.rmtree(tmp_bin)
+    shim_env = {**rg_shim, "PF_SHIM_MODE": "error_call"} # Fail if called
+
+    # Case 1: type all -> rg should NOT be called
+    res_all = run_script(script_path, ["--type", "all", "hello", "simple.py"], cwd=fixtures_dir, env_overrides=shim_env)
+    assert res_all.returncode == 0
+    assert "RG WAS CALLED" not in res_all.stderr
+
+    # Case 2: type py -> rg SHOULD be called (and fail with warning, but fallback succeeds)
+    res_py = run_script(script_path, ["hello", "simple.py"], cwd=fixtures_dir, env_overrides=shim_env)
+    assert res_py.returncode == 0
+    assert_contains_all(res_py.stderr, ["RG WAS CALLED", "Warning: rg failed"])
 
 def test_output_equivalence(script_path, fixtures_dir):
     # Compare output with and without rg for a glob query
     # Ensure make_hdrop case (recursive glob) works
-    
-    # Setup recursive structure
-    os.makedirs(os.path.join(fixtures_dir, "recur/sive"), exist_ok=True)
-    with open(os.path.join(fixtures_dir, "recur/sive/target.py"), "w") as f:
-        f.write("def target_func():\n    pass\n")
-        
-    # Run with RG (default)
-    res_rg = run_script(script_path, ["target_func", "**/*.py"], cwd=fixtures_dir)
+    # (recur/sive/target.py is checked in under tests/fixtures)
+
+    # Run with RG (default) and without RG concurrently
+    res_rg, res_no_rg = run_pair(script_path, ["target_func", "**/*.py"], ["target_func", "**/*.py"], fixtures_dir, env=BASE_ENV)
     assert res_rg.returncode == 0
-    
-    # Run without RG
-    env_no_rg = os.environ.copy()
-    env_no_rg["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target_func", "**/*.py"], cwd=fixtures_dir, env=env_no_rg)
     assert res_no_rg.returncode == 0
     
     assert res_rg.stdout == res_no_rg.stdout
@@ -1,77 +1,52 @@
 import pytest
-import subprocess
 import os
 import sys
-import shutil
 
-@pytest.fixture
-def script_path():
-    path = os.path.abspath("printfunction.sh")
-    os.chmod(path, 0o755)
-    return path
+from helpers import write_if_changed, assert_contains_all, run_captured, run_pair
 
 @pytest.fixture
 def fixtures_dir(tmp_path):
     return str(tmp_path)
 
-def run_script(script_path, args, cwd, env=None):
-    if env is None:
-        env = os.environ.copy()
-    
-    # Enable test debug output
-    env["PF_TEST_RG_USED"] = "1"
-    
-    # Ensure script is executable
-    os.chmod(script_path, 0o755)
-    
-    cmd = [script_path] + args
-    result = subprocess.run(
-        cmd,
-        cwd=cwd,
-        env=env,
-        capture_output=True,
-        text=True
-    )
-    return result
+# Environment for every run (with test debug output enabled), copied only
+# when a test adds overrides
+BASE_ENV = {**os.environ, "PF_TEST_RG_USED": "1"}
+
+def run_script(script_path, args, cwd, env_overrides=None):
+    env = {**BASE_ENV, **env_overrides} if env_overrides else BASE_ENV
+    return run_captured(script_path, args, cwd=cwd, env=env)
+
+def run_rg_pair(script_path, args, cwd):
+    """Run args with rg and with PF_DISABLE_RG=1 concurrently; return (res_rg, res_no_rg)."""
+    return run_pair(script_path, args, args, cwd, env=BASE_ENV)
 
 def create_file(root, path, content="def target(): pass\n"):
     full_path = os.path.join(root, path)
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-    with open(full_path, "w") as f:
-        f.write(content)
+    # Skips the open/write (and makedirs) when the file already has this content
+    write_if_changed(full_path, content)
     return full_path
 
 def test_restrictive_glob_does_not_broaden(script_path, fixtures_dir):
     create_file(fixtures_dir, "a/a.py", "def target(): pass\n")
     create_file(fixtures_dir, "b/b.py", "def target(): pass\n")
     
-    # Run with RG
-    res_rg = run_script(script_path, ["target", "a/*.py"], cwd=fixtures_dir)
+    # Run with and without RG
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "a/*.py"], cwd=fixtures_dir)
     assert res_rg.returncode == 0
     assert "a/a.py" in res_rg.stdout
     assert "b/b.py" not in res_rg.stdout
     assert "DEBUG: RG USED" in res_rg.stderr
-    
-    # Run without RG
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "a/*.py"], cwd=fixtures_dir, env=env)
-    
     assert res_rg.stdout == res_no_rg.stdout
     assert "DEBUG: RG USED" not in res_no_rg.stderr
 
 def test_directory_yielding_glob_no_false_warning(script_path, fixtures_dir):
     create_file(fixtures_dir, "pkg/mod.py", "def target(): pass\n")
     
-    res_rg = run_script(script_path, ["target", "pkg/**"], cwd=fixtures_dir)
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "pkg/**"], cwd=fixtures_dir)
     assert res_rg.returncode == 0
     assert "glob matched no files" not in res_rg.stderr
     assert "DEBUG: RG USED" in res_rg.stderr
     
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "pkg/**"], cwd=fixtures_dir, env=env)
-    
     assert res_rg.stdout == res_no_rg.stdout
     assert res_rg.stderr.replace("DEBUG: RG USED\n", "") == res_no_rg.stderr
 
@@ -79,16 +54,12 @@ def test_ignored_only_glob_behavior(script_path, fixtures_dir):
     create_file(fixtures_dir, "verify_venv/x.py", "def target(): pass\n")
     
     # NEW behavior: ignored dirs are always ignored; user-provided globs inside ignored dirs do NOT override.
-    res_rg = run_script(script_path, ["target", "verify_venv/**"], cwd=fixtures_dir)
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "verify_venv/**"], cwd=fixtures_dir)
     assert res_rg.returncode == 1
     assert "glob matched no files" not in res_rg.stderr
     assert res_rg.stdout == ""
     assert "DEBUG: RG USED" in res_rg.stderr
     
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "verify_venv/**"], cwd=fixtures_dir, env=env)
-    
     # Parity check
     assert res_rg.returncode == res_no_rg.returncode
     assert res_rg.stdout == res_no_rg.stdout
@@ -108,74 +79,46 @@ def test_non_py_only_glob_warns(script_path, fixtures_dir):
 def test_warning_formatting_regression(script_path, fixtures_dir):
     create_file(fixtures_dir, "valid.py", "def target(): pass\n")
     
-    res_rg = run_script(script_path, ["target", "NO_SUCH_FILE.py", "really_no_match/nonexistent*", "valid.py"], cwd=fixtures_dir)
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "NO_SUCH_FILE.py", "really_no_match/nonexistent*", "valid.py"], cwd=fixtures_dir)
     
-    assert "Warning: file not found: NO_SUCH_FILE.py" in res_rg.stderr
-    assert "Warning: glob matched no files: really_no_match/nonexistent*" in res_rg.stderr
+    assert_contains_all(res_rg.stderr, [
+        "Warning: file not found: NO_SUCH_FILE.py",
+        "Warning: glob matched no files: really_no_match/nonexistent*",
+        "DEBUG: RG USED",
+    ])
     assert "Warning: file not found: glob matched no files" not in res_rg.stderr
-    assert "DEBUG: RG USED" in res_rg.stderr
-    
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "NO_SUCH_FILE.py", "really_no_match/nonexistent*", "valid.py"], cwd=fixtures_dir, env=env)
     
     assert res_rg.stderr.replace("DEBUG: RG USED\n", "") == res_no_rg.stderr
 
-def test_rg_error_fallback_single_line(script_path, fixtures_dir):
-    import tempfile
-    tmp_bin = tempfile.mkdtemp()
-    rg_shim = os.path.join(tmp_bin, "rg")
-    with open(rg_shim, "w") as f:
-        f.write("#!/bin/sh\n")
-        f.write("echo 'Some Error' >&2\n")
-        f.write("exit 2\n")
-    os.chmod(rg_shim, 0o755)
-    
-    env = os.environ.copy()
-    env["PATH"] = f"{tmp_bin}{os.pathsep}{env.get('PATH', '')}"
-    env["PF_TEST_RG_USED"] = "1"
+def test_rg_error_fallback_single_line(script_path, fixtures_dir, rg_shim):
+    shim_env = {**rg_shim, "PF_SHIM_MODE": "fail2", "PF_SHIM_STDERR": "Some Error"}
     
     create_file(fixtures_dir, "a.py", "def target(): pass\n")
     
-    res = run_script(script_path, ["target", "."], cwd=fixtures_dir, env=env)
+    res = run_script(script_path, ["target", "."], cwd=fixtures_dir, env_overrides=shim_env)
     
     assert "Warning: rg failed (exit 2): Some Error; falling back to full scan." in res.stderr
     assert "def target():" in res.stdout
     assert res.returncode == 0
     # RG failed, so PF_RG_USED should NOT be set (or at least not passed to python success path)
     assert "DEBUG: RG USED" not in res.stderr
-    
-    shutil.rmtree(tmp_bin)
 
-def test_rg_success_empty_json(script_path, fixtures_dir):
+def test_rg_success_empty_json(script_path, fixtures_dir, rg_shim):
     # Test 7: Rg succeeds but empty output (e.g. no matches)
     # Should fall back to full scan (because file_targets empty)
     # And PF_RG_USED should be set in bash, but Python "if file_targets" is false.
     # So "DEBUG: RG USED" will be printed if it's outside "if file_targets".
     # I placed it at top of Run.
     # So it should be printed.
-    
-    import tempfile
-    tmp_bin = tempfile.mkdtemp()
-    rg_shim = os.path.join(tmp_bin, "rg")
-    with open(rg_shim, "w") as f:
-        f.write("#!/bin/sh\n")
-        f.write("exit 0\n") 
-    os.chmod(rg_shim, 0o755)
-    
-    env = os.environ.copy()
-    env["PATH"] = f"{tmp_bin}{os.pathsep}{env.get('PATH', '')}"
-    env["PF_TEST_RG_USED"] = "1"
-    
+
+    shim_env = {**rg_shim, "PF_SHIM_MODE": "empty0"}
+
     create_file(fixtures_dir, "a.py", "def target(): pass\n")
-    
-    try:
-        res = run_script(script_path, ["target", "."], cwd=fixtures_dir, env=env)
-        assert res.returncode == 0
-        assert "def target():" in res.stdout
-        assert "DEBUG: RG USED" in res.stderr
-    finally:
-        shutil.rmtree(tmp_bin)
+
+    res = run_script(script_path, ["target", "."], cwd=fixtures_dir, env_overrides=shim_env)
+    assert res.returncode == 0
+    assert "def target():" in res.stdout
+    assert "DEBUG: RG USED" in res.stderr
 
 def test_output_ordering_parity(script_path, fixtures_dir):
     # Test 6: Output ordering parity
@@ -183,12 +126,8 @@ def test_output_ordering_parity(script_path, fixtures_dir):
     create_file(fixtures_dir, "a2.py", "def target(): pass\n")
     create_file(fixtures_dir, "b1.py", "def target(): pass\n")
     
-    res_rg = run_script(script_path, ["target", "**/*.py"], cwd=fixtures_dir)
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "**/*.py"], cwd=fixtures_dir)
     assert res_rg.returncode == 0
-    
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "**/*.py"], cwd=fixtures_dir, env=env)
     assert res_no_rg.returncode == 0
     
     assert res_rg.stdout == res_no_rg.stdout
@@ -198,16 +137,11 @@ def test_bracket_glob_handling(script_path, fixtures_dir):
     create_file(fixtures_dir, "x/b.py", "def target(): pass\n")
     create_file(fixtures_dir, "x/c.py", "def target(): pass\n")
     
-    res_rg = run_script(script_path, ["target", "x/[ab].py"], cwd=fixtures_dir)
+    res_rg, res_no_rg = run_rg_pair(script_path, ["target", "x/[ab].py"], cwd=fixtures_dir)
     assert res_rg.returncode == 0
-    assert "x/a.py" in res_rg.stdout
-    assert "x/b.py" in res_rg.stdout
+    assert_contains_all(res_rg.stdout, ["x/a.py", "x/b.py"])
     assert "x/c.py" not in res_rg.stdout
     assert "DEBUG: RG USED" in res_rg.stderr
     
-    env = os.environ.copy()
-    env["PF_DISABLE_RG"] = "1"
-    res_no_rg = run_script(script_path, ["target", "x/[ab].py"], cwd=fixtures_dir, env=env)
-    
     assert res_rg.stdout == res_no_rg.stdout
     assert res_rg.stderr.replace("DEBUG: RG USED\n", "") == res_no_rg.stderr